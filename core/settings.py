@@ -153,6 +153,22 @@ OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'meta-llama/llama-3.1-8b-instru
 # OPENROUTER_MODEL = 'anthropic/claude-3.5-sonnet'  # Paid
 # OPENROUTER_MODEL = 'openai/gpt-4o'  # Paid
 
+# Cache (used for simulation results)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'quantum-tutor',
+    }
+}
+
+# To share cached results between workers:
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+#     }
+# }
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -6,7 +6,7 @@ from django.views.generic import RedirectView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('tutor.urls')),
+    # tutor.urls prefixes its own API routes with api/, so it is included once at the root
     path('', include('tutor.urls')),
 
     # Redirect login to admin login for now
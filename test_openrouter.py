@@ -18,6 +18,11 @@ def test_openrouter():
         # Test a simple question
         response = tutor.answer_question("What is a qubit?")
         print("Response:", response)
+        
+        # Test concurrent explanations
+        explanations = tutor.generate_gate_explanations([('h', None), ('x', None), ('cx', None)], 'beginner')
+        for gate_type, explanation in zip(['h', 'x', 'cx'], explanations):
+            print(f"{gate_type}:", explanation)
     else:
         print("Please set OPENROUTER_API_KEY in your .env file")
 
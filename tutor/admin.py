@@ -16,18 +16,29 @@ class CustomUserAdmin(UserAdmin):
 class CircuitGateInline(admin.TabularInline):
     model = CircuitGate
     extra = 0
+    # Parameters are edited from the gate's own change page, but each row's label
+    # (CircuitGate.__str__) still reads them
+    fields = ('step_order', 'gate_type', 'qubits')
+    show_change_link = True
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).order_by('step_order').only(
+            'circuit', 'step_order', 'gate_type', 'qubits', 'parameters'
+        )
 
 @admin.register(QuantumCircuit)
 class QuantumCircuitAdmin(admin.ModelAdmin):
     list_display = ('title', 'user', 'num_qubits', 'created_at')
     list_filter = ('created_at', 'num_qubits')
     search_fields = ('title', 'qiskit_code')
+    list_select_related = ('user',)
     inlines = [CircuitGateInline]
 
 @admin.register(CircuitGate)
 class CircuitGateAdmin(admin.ModelAdmin):
     list_display = ('gate_type', 'circuit', 'step_order', 'qubits_display')
     list_filter = ('gate_type', 'circuit')
+    list_select_related = ('circuit',)
     
     def qubits_display(self, obj):
         return str(obj.qubits)
@@ -43,12 +54,14 @@ class ExplanationAdmin(admin.ModelAdmin):
 class SimulationResultAdmin(admin.ModelAdmin):
     list_display = ('circuit', 'shots', 'created_at')
     list_filter = ('created_at',)
+    list_select_related = ('circuit',)
 
 @admin.register(QASession)
 class QASessionAdmin(admin.ModelAdmin):
     list_display = ('user', 'question_preview', 'created_at')
     list_filter = ('created_at', 'user')
     search_fields = ('question', 'answer')
+    list_select_related = ('user', 'circuit')
     
     def question_preview(self, obj):
         return obj.question[:50] + '...' if len(obj.question) > 50 else obj.question
@@ -57,4 +70,5 @@ class QASessionAdmin(admin.ModelAdmin):
 @admin.register(QuizQuestion)
 class QuizQuestionAdmin(admin.ModelAdmin):
     list_display = ('circuit', 'difficulty_level', 'created_at')
-    list_filter = ('difficulty_level', 'created_at')
\ No newline at end of file
+    list_filter = ('difficulty_level', 'created_at')
+    list_select_related = ('circuit',)
\ No newline at end of file
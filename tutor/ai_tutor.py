@@ -1,13 +1,47 @@
 from .openrouter_tutor import OpenRouterTutor
+from .microbatcher import MicroBatcher
 import os
+import threading
+import time
 from django.conf import settings
 
+# Longest a request thread waits on the batcher before falling back, so a stalled
+# loop can't hang it
+BATCH_RESULT_TIMEOUT = 60
+
+_batcher = None
+_batch_client = None
+_batcher_lock = threading.Lock()
+
+def _get_batcher():
+    """Return the process-wide MicroBatcher and the OpenRouterTutor its event loop calls into"""
+    global _batcher, _batch_client
+    with _batcher_lock:
+        if _batcher is None:
+            # One client for the batcher loop, so its async connection pool is shared
+            _batch_client = OpenRouterTutor()
+            _batcher = MicroBatcher(max_batch_size=16, max_wait_ms=10, max_in_flight=32)
+            _batcher.start()
+    return _batcher, _batch_client
+
+_tutor = None
+_tutor_lock = threading.Lock()
+
+def get_tutor():
+    """Return the process-wide AITutor, so requests don't rebuild clients per call"""
+    global _tutor
+    with _tutor_lock:
+        if _tutor is None:
+            _tutor = AITutor()
+    return _tutor
+
 class AITutor:
     def __init__(self):
         self.provider = settings.AI_PROVIDER
         
         if self.provider == 'openrouter':
             self.client = OpenRouterTutor()
+            self.batcher, self.batch_client = _get_batcher()
         else:
             # Fallback to original implementation for other providers
             self.client = None
@@ -15,7 +49,11 @@ class AITutor:
     
     def generate_gate_explanation(self, gate_type, difficulty_level, context_gates=None):
         """Generate explanation for a quantum gate"""
-        return self.client.generate_gate_explanation(gate_type, difficulty_level, context_gates)
+        return self.generate_gate_explanations([(gate_type, context_gates)], difficulty_level)[0]
+    
+    def stream_gate_explanation(self, gate_type, difficulty_level, context_gates=None):
+        """Yield a gate explanation in chunks as it is generated"""
+        return self.client.stream_gate_explanation(gate_type, difficulty_level, context_gates)
     
     def answer_question(self, question, circuit_context=None, user_difficulty='beginner'):
         """Answer user's quantum computing question"""
@@ -23,4 +61,42 @@ class AITutor:
     
     def generate_quiz_question(self, circuit, difficulty_level):
         """Generate a quiz question based on the circuit"""
-        return self.client.generate_quiz_question(circuit, difficulty_level)
\ No newline at end of file
+        return self.client.generate_quiz_question(circuit, difficulty_level)
+    
+    def generate_gate_explanations(self, gates, difficulty_level):
+        """Generate explanations for a list of (gate_type, context_gates) pairs concurrently"""
+        # Cache and database lookups stay on this thread; only the completions are batched
+        return self.client.generate_gate_explanations(gates, difficulty_level, self._batched_complete_all)
+    
+    def stored_gate_explanations(self, gates, difficulty_level):
+        """Already stored explanations for (gate_type, context_gates) pairs, None where missing"""
+        return [
+            self.client._stored_gate_explanation(gate_type, difficulty_level, context_gates)
+            for gate_type, context_gates in gates
+        ]
+    
+    def _batched_complete_all(self, prompts):
+        # Submit everything before waiting so the batcher can flush the requests together
+        futures = [self.batcher.submit(self.batch_client._acomplete, prompt) for prompt in prompts]
+        deadline = time.monotonic() + BATCH_RESULT_TIMEOUT
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+            except TimeoutError:
+                results.append(TimeoutError(f"no response within {BATCH_RESULT_TIMEOUT}s"))
+            except Exception as e:
+                results.append(e)
+        return results
+    
+    async def agenerate_gate_explanation(self, gate_type, difficulty_level, context_gates=None):
+        """Async variant of generate_gate_explanation"""
+        return await self.client.agenerate_gate_explanation(gate_type, difficulty_level, context_gates)
+    
+    async def aanswer_question(self, question, circuit_context=None, user_difficulty='beginner'):
+        """Async variant of answer_question"""
+        return await self.client.aanswer_question(question, circuit_context, user_difficulty)
+    
+    async def agenerate_quiz_question(self, circuit, difficulty_level):
+        """Async variant of generate_quiz_question"""
+        return await self.client.agenerate_quiz_question(circuit, difficulty_level)
\ No newline at end of file
@@ -1,6 +1,12 @@
+import atexit
+
 from django.apps import AppConfig
 
 
 class TutorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tutor'
+
+    def ready(self):
+        from .openrouter_tutor import close_http_client
+        atexit.register(close_http_client)
@@ -0,0 +1,32 @@
+import json
+
+import orjson
+from django.db import models
+
+
+class OrjsonEncoder(json.JSONEncoder):
+    """JSON encoder that hands the whole document to orjson"""
+    def encode(self, o):
+        return orjson.dumps(o, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+class OrjsonDecoder(json.JSONDecoder):
+    """JSON decoder that parses with orjson"""
+    def decode(self, s, *args, **kwargs):
+        return orjson.loads(s)
+
+
+class FastJSONField(models.JSONField):
+    """JSONField that (de)serializes with orjson, for large simulation payloads"""
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('encoder', OrjsonEncoder)
+        kwargs.setdefault('decoder', OrjsonDecoder)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('encoder') is OrjsonEncoder:
+            del kwargs['encoder']
+        if kwargs.get('decoder') is OrjsonDecoder:
+            del kwargs['decoder']
+        return name, path, args, kwargs
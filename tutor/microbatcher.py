@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+class PendingChatCompletion:
+    """A queued completion request and the future that receives its result"""
+    def __init__(self, future, func, args):
+        self.future = future
+        self.func = func
+        self.args = args
+
+
+class MicroBatcher:
+    """Buffer completion requests for a few milliseconds and flush them concurrently.
+
+    The batcher owns a background event loop, so synchronous callers can submit
+    work from any thread and block on the returned future.
+    """
+    def __init__(self, max_batch_size=16, max_wait_ms=10, max_in_flight=32):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self._loop = None
+        self._queue = None
+        self._in_flight = None
+        self._tasks = set()
+        self._started = threading.Event()
+
+    def start(self):
+        """Start the background event loop thread"""
+        thread = threading.Thread(target=self._run_forever, name='tutor-microbatcher', daemon=True)
+        thread.start()
+        self._started.wait()
+
+    def submit(self, func, *args):
+        """Queue ``await func(*args)`` and return a concurrent.futures.Future for its result"""
+        pending = PendingChatCompletion(Future(), func, args)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, pending)
+        return pending.future
+
+    def _run_forever(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._started.set()
+        self._loop.run_until_complete(self._run_loop())
+
+    async def _run_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Flush in the background so the next batch can start filling immediately
+            task = self._loop.create_task(self._flush(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_one(self, pending):
+        # Overlapping flushes share one cap on concurrent upstream requests
+        async with self._in_flight:
+            return await pending.func(*pending.args)
+    
+    async def _flush(self, batch):
+        try:
+            results = await asyncio.gather(
+                *[self._run_one(pending) for pending in batch],
+                return_exceptions=True
+            )
+        finally:
+            # Async ORM calls in the batch run on sync_to_async's shared thread, whose
+            # connections no request cycle will ever close
+            await sync_to_async(close_old_connections)()
+        for pending, result in zip(batch, results):
+            # A caller that gave up may have cancelled its future
+            if pending.future.cancelled():
+                continue
+            if isinstance(result, BaseException):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-14 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='circuitgate',
+            index=models.Index(fields=['circuit', 'step_order'], name='tutor_circu_circuit_8a2c5a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='qasession',
+            index=models.Index(fields=['user', '-created_at'], name='tutor_qases_user_id_92cb61_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quantumcircuit',
+            index=models.Index(fields=['user', '-created_at'], name='tutor_quant_user_id_6c6319_idx'),
+        ),
+    ]
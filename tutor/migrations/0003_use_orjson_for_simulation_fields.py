@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-14 04:59
+
+import tutor.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutor', '0002_add_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='simulationresult',
+            name='counts',
+            field=tutor.fields.FastJSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='simulationresult',
+            name='probabilities',
+            field=tutor.fields.FastJSONField(),
+        ),
+        migrations.AlterField(
+            model_name='simulationresult',
+            name='statevector',
+            field=tutor.fields.FastJSONField(),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-14 05:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutor', '0003_use_orjson_for_simulation_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationresult',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-14 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutor', '0004_simulationresult_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationresult',
+            name='code_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-14 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutor', '0005_simulationresult_code_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quantumcircuit',
+            index=models.Index(fields=['user', '-updated_at'], name='tutor_quant_user_id_9ab5bd_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 import json
+from .fields import FastJSONField
 
 class User(AbstractUser):
     DIFFICULTY_LEVELS = [
@@ -28,6 +30,12 @@ class QuantumCircuit(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['user', '-updated_at'])
+        ]
+    
     def __str__(self):
         return f"{self.title} ({self.num_qubits} qubits)"
 
@@ -59,6 +67,56 @@ class CircuitGate(models.Model):
     
     class Meta:
         ordering = ['step_order']
+        indexes = [models.Index(fields=['circuit', 'step_order'])]
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._touch_circuit()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._touch_circuit()
+        return result
+    
+    def _touch_circuit(self):
+        # Edits made one gate at a time (the admin) bump the circuit's updated_at,
+        # which the circuit page and explanation ETags are built from
+        QuantumCircuit.objects.filter(pk=self.circuit_id).update(updated_at=timezone.now())
+    
+    @classmethod
+    def sync_from_parsed(cls, circuit, gates):
+        """Make circuit's rows match gates parsed by CircuitParser.extract_gates_from_circuit.
+        
+        Rows are matched on step_order; only new, changed and stale rows are written.
+        Returns True if anything was written.
+        """
+        existing = {}
+        stale = []
+        for gate in circuit.gates.all():
+            if gate.step_order in existing:
+                stale.append(gate.pk)
+            else:
+                existing[gate.step_order] = gate
+        
+        to_create = []
+        to_update = []
+        for gate_data in gates:
+            gate = existing.pop(gate_data['step_order'], None)
+            if gate is None:
+                to_create.append(cls(circuit=circuit, **gate_data))
+            elif any(getattr(gate, field) != value for field, value in gate_data.items()):
+                for field, value in gate_data.items():
+                    setattr(gate, field, value)
+                to_update.append(gate)
+        stale.extend(gate.pk for gate in existing.values())
+        
+        if stale:
+            cls.objects.filter(pk__in=stale).delete()
+        if to_update:
+            cls.objects.bulk_update(to_update, ['gate_type', 'qubits', 'parameters'], batch_size=500)
+        if to_create:
+            cls.objects.bulk_create(to_create, batch_size=500)
+        return bool(stale or to_update or to_create)
     
     def __str__(self):
         params = f"({self.parameters})" if self.parameters else ""
@@ -87,14 +145,34 @@ class Explanation(models.Model):
 
 class SimulationResult(models.Model):
     circuit = models.OneToOneField(QuantumCircuit, on_delete=models.CASCADE, related_name='simulation')
-    statevector = models.JSONField()  # Complex numbers as [real, imag] pairs
-    probabilities = models.JSONField()  # Measurement probabilities
-    counts = models.JSONField(default=dict)  # Measurement counts from multiple shots
+    statevector = FastJSONField()  # Parallel states/real/imag/prob lists
+    probabilities = FastJSONField()  # Measurement probabilities
+    counts = FastJSONField(default=dict)  # Measurement counts from multiple shots
     shots = models.IntegerField(default=1024)
+    code_hash = models.CharField(max_length=64, blank=True, default='')  # sha256 of the simulated qiskit_code
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Simulation for {self.circuit.title}"
+    
+    @property
+    def statevector_rows(self):
+        """Statevector as one dict per basis state, for templates"""
+        statevector = self.statevector
+        # Results saved before the parallel-array layout are already rows
+        if isinstance(statevector, list):
+            return statevector
+        
+        rows = [
+            {'state': state, 'amplitude_real': real, 'amplitude_imag': imag, 'probability': probability}
+            for state, real, imag, probability in zip(
+                statevector['states'], statevector['real'], statevector['imag'], statevector['prob']
+            )
+        ]
+        if 'other_prob' in statevector:
+            rows.append({'state': 'other', 'probability': statevector['other_prob']})
+        return rows
 
 class QASession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='qa_sessions')
@@ -104,6 +182,9 @@ class QASession(models.Model):
     context_gates = models.JSONField(default=list, blank=True)  # Relevant gates for context
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [models.Index(fields=['user', '-created_at'])]
+    
     def __str__(self):
         return f"Q: {self.question[:50]}..."
 
@@ -117,4 +198,13 @@ class QuizQuestion(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"Quiz for {self.circuit.title}"
\ No newline at end of file
+        return f"Quiz for {self.circuit.title}"
+
+class QueuedTask(models.Model):
+    """Owner of a Celery task queued with ?async=1, checked before its status is shown"""
+    task_id = models.CharField(max_length=255, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='queued_tasks')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Task {self.task_id} for {self.user.username}"
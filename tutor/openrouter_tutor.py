@@ -1,7 +1,111 @@
-import requests
+import asyncio
+import hashlib
+import httpx
 import json
 import os
+import re
+from functools import lru_cache
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, stop_after_delay, wait_exponential
+from .models import Explanation
+
+# Shared connection pool so warm calls reuse one HTTP/2 connection instead of
+# paying a TCP+TLS handshake per request
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+
+def _build_headers(api_key):
+    """Headers for every OpenRouter request, shared by the sync and async clients"""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://quantum-tutor.com",  # Required by OpenRouter
+        "X-Title": "Quantum Tutor"  # Required by OpenRouter
+    }
+
+_HTTP = httpx.Client(
+    http2=True,
+    limits=_HTTP_LIMITS,
+    headers=_build_headers(settings.OPENROUTER_API_KEY),
+    timeout=30
+)
+
+# Failures to connect are usually transient and the request never reached
+# OpenRouter, so those are retried briefly; a read timeout may already have been
+# billed and would block the caller for another full timeout, so it is not
+_retry_transient = retry(
+    stop=stop_after_attempt(3) | stop_after_delay(5),
+    wait=wait_exponential(multiplier=0.3, max=2),
+    retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)),
+    reraise=True
+)
+
+def close_http_client():
+    """Close the shared OpenRouter HTTP client"""
+    _HTTP.close()
+
+BASE_PROMPTS = {
+    'beginner': """
+        Explain the {gate_type} quantum gate to a complete beginner who has no background in quantum computing.
+        Use simple analogies from everyday life.
+        Focus on what the gate does in simple terms, not the mathematics.
+        Include 2-3 practical analogies.
+        Keep it under 200 words.
+        """,
+    
+    'intermediate': """
+        Explain the {gate_type} quantum gate to someone with basic quantum computing knowledge.
+        Include the mathematical representation and matrix form if applicable.
+        Explain how it affects qubit states.
+        Mention common use cases in quantum algorithms.
+        Keep it under 300 words.
+        """,
+    
+    'advanced': """
+        Provide a comprehensive technical explanation of the {gate_type} quantum gate.
+        Include:
+        - Mathematical representation and matrix
+        - Effect on Bloch sphere
+        - Quantum mechanical principles involved
+        - Role in quantum algorithms
+        - Experimental implementations
+        Keep it under 400 words.
+        """,
+    
+    'eli5': """
+        Explain the {gate_type} quantum gate like I'm 5 years old.
+        Use the simplest possible language and fun analogies.
+        Make it engaging and easy to understand.
+        Avoid any technical terms.
+        Keep it under 150 words.
+        """
+}
+
+@lru_cache(maxsize=256)
+def _gate_explanation_prompt(gate_type, difficulty_level, context_gates):
+    prompt = BASE_PROMPTS.get(difficulty_level, BASE_PROMPTS['beginner']).format(gate_type=gate_type)
+    
+    if context_gates:
+        context_str = ", ".join(context_gates)
+        prompt += f"\n\nContext: This gate is used after {context_str} gates in the circuit."
+    
+    return prompt
+
+EXPLANATION_CACHE_TIMEOUT = 86400
+
+def _explanation_cache_key(gate_type, difficulty_level, context_gates):
+    signature = f"{gate_type}|{difficulty_level}|{','.join(context_gates or ())}"
+    return f"explanation:{hashlib.md5(signature.encode()).hexdigest()}"
+
+# One tagged section of a quiz response, running until the next tag
+_QUIZ_SECTION_RE = re.compile(
+    r'^[ \t]*(QUESTION|OPTIONS|CORRECT|EXPLANATION):(.*(?:\n(?![ \t]*(?:QUESTION|OPTIONS|CORRECT|EXPLANATION):).*)*)',
+    re.MULTILINE
+)
+
+class OpenRouterError(Exception):
+    """Raised when OpenRouter answers with a non-200 status"""
 
 class OpenRouterTutor:
     def __init__(self):
@@ -9,11 +113,17 @@ class OpenRouterTutor:
         self.base_url = settings.OPENROUTER_BASE_URL
         self.model = settings.OPENROUTER_MODEL
         self.is_configured = bool(self.api_key)
+        self._client = None
+        self._client_loop = None
     
     def generate_gate_explanation(self, gate_type, difficulty_level, context_gates=None):
         """Generate explanation for a quantum gate using OpenRouter"""
+        return self.generate_gate_explanations([(gate_type, context_gates)], difficulty_level)[0]
+    
+    def stream_gate_explanation(self, gate_type, difficulty_level, context_gates=None):
+        """Yield a gate explanation in chunks as OpenRouter generates it"""
         prompt = self._build_gate_explanation_prompt(gate_type, difficulty_level, context_gates)
-        return self._call_openrouter(prompt)
+        return self.stream_openrouter(prompt)
     
     def answer_question(self, question, circuit_context=None, user_difficulty='beginner'):
         """Answer user's quantum computing question using OpenRouter"""
@@ -21,56 +131,129 @@ class OpenRouterTutor:
         return self._call_openrouter(prompt, max_tokens=1000)
     
     def generate_quiz_question(self, circuit, difficulty_level):
-        """Generate a quiz question based on the circuit using OpenRouter"""
+        """Generate a quiz question based on the circuit using OpenRouter.
+        
+        The circuit must be fetched with prefetch_related('gates').
+        """
         prompt = self._build_quiz_prompt(circuit, difficulty_level)
         response = self._call_openrouter(prompt, max_tokens=800)
         return self._parse_quiz_response(response)
     
-    def _build_gate_explanation_prompt(self, gate_type, difficulty_level, context_gates):
-        base_prompts = {
-            'beginner': f"""
-            Explain the {gate_type} quantum gate to a complete beginner who has no background in quantum computing.
-            Use simple analogies from everyday life.
-            Focus on what the gate does in simple terms, not the mathematics.
-            Include 2-3 practical analogies.
-            Keep it under 200 words.
-            """,
-            
-            'intermediate': f"""
-            Explain the {gate_type} quantum gate to someone with basic quantum computing knowledge.
-            Include the mathematical representation and matrix form if applicable.
-            Explain how it affects qubit states.
-            Mention common use cases in quantum algorithms.
-            Keep it under 300 words.
-            """,
-            
-            'advanced': f"""
-            Provide a comprehensive technical explanation of the {gate_type} quantum gate.
-            Include:
-            - Mathematical representation and matrix
-            - Effect on Bloch sphere
-            - Quantum mechanical principles involved
-            - Role in quantum algorithms
-            - Experimental implementations
-            Keep it under 400 words.
-            """,
-            
-            'eli5': f"""
-            Explain the {gate_type} quantum gate like I'm 5 years old.
-            Use the simplest possible language and fun analogies.
-            Make it engaging and easy to understand.
-            Avoid any technical terms.
-            Keep it under 150 words.
-            """
-        }
+    async def agenerate_gate_explanation(self, gate_type, difficulty_level, context_gates=None):
+        """Async variant of generate_gate_explanation"""
+        explanation = await sync_to_async(self._stored_gate_explanation)(gate_type, difficulty_level, context_gates)
+        if explanation is not None:
+            return explanation
+        
+        prompt = self._build_gate_explanation_prompt(gate_type, difficulty_level, context_gates)
+        if not self.is_configured:
+            return self._fallback_response(prompt)
+        try:
+            explanation = await self._acomplete(prompt)
+        except Exception as e:
+            return self._fallback_response(prompt, self._error_message(e))
         
-        prompt = base_prompts.get(difficulty_level, base_prompts['beginner'])
+        await sync_to_async(self._store_gate_explanation)(gate_type, difficulty_level, context_gates, explanation)
+        return explanation
+    
+    async def aanswer_question(self, question, circuit_context=None, user_difficulty='beginner'):
+        """Async variant of answer_question"""
+        prompt = self._build_qa_prompt(question, circuit_context, user_difficulty)
+        return await self._acall_openrouter(prompt, max_tokens=1000)
+    
+    async def agenerate_quiz_question(self, circuit, difficulty_level):
+        """Async variant of generate_quiz_question"""
+        prompt = self._build_quiz_prompt(circuit, difficulty_level)
+        response = await self._acall_openrouter(prompt, max_tokens=800)
+        return self._parse_quiz_response(response)
+    
+    def generate_gate_explanations(self, gates, difficulty_level, complete_all=None):
+        """Generate explanations for many (gate_type, context_gates) pairs.
         
-        if context_gates:
-            context_str = ", ".join(context_gates)
-            prompt += f"\n\nContext: This gate is used after {context_str} gates in the circuit."
+        Stored explanations are reused and the rest are requested together through
+        complete_all(prompts), which returns each completion text or the exception
+        that replaced it; by default the requests run concurrently on an event loop.
+        """
+        explanations = [
+            self._stored_gate_explanation(gate_type, difficulty_level, context_gates)
+            for gate_type, context_gates in gates
+        ]
+        missing = [i for i, explanation in enumerate(explanations) if explanation is None]
+        if not missing:
+            return explanations
         
-        return prompt
+        prompts = [self._build_gate_explanation_prompt(gates[i][0], difficulty_level, gates[i][1]) for i in missing]
+        if not self.is_configured:
+            results = [None] * len(prompts)
+        else:
+            results = (complete_all or self._complete_all)(prompts)
+        
+        for i, prompt, result in zip(missing, prompts, results):
+            if result is None:
+                explanations[i] = self._fallback_response(prompt)
+            elif isinstance(result, BaseException):
+                explanations[i] = self._fallback_response(prompt, self._error_message(result))
+            else:
+                gate_type, context_gates = gates[i]
+                self._store_gate_explanation(gate_type, difficulty_level, context_gates, result)
+                explanations[i] = result
+        return explanations
+    
+    def _stored_gate_explanation(self, gate_type, difficulty_level, context_gates):
+        """Explanation from the cache or, for context-free requests, the database"""
+        key = _explanation_cache_key(gate_type, difficulty_level, context_gates)
+        explanation = cache.get(key)
+        if explanation is not None:
+            return explanation
+        
+        # Context-free explanations are also stored per (gate_type, difficulty_level),
+        # so they survive cache eviction
+        if not context_gates:
+            stored = Explanation.objects.filter(
+                gate_type=gate_type, difficulty_level=difficulty_level
+            ).only('explanation_text').first()
+            if stored:
+                cache.set(key, stored.explanation_text, timeout=EXPLANATION_CACHE_TIMEOUT)
+                return stored.explanation_text
+        return None
+    
+    def _store_gate_explanation(self, gate_type, difficulty_level, context_gates, explanation):
+        if not context_gates:
+            Explanation.objects.update_or_create(
+                gate_type=gate_type,
+                difficulty_level=difficulty_level,
+                defaults={'explanation_text': explanation}
+            )
+        cache.set(
+            _explanation_cache_key(gate_type, difficulty_level, context_gates),
+            explanation,
+            timeout=EXPLANATION_CACHE_TIMEOUT
+        )
+    
+    def _complete_all(self, prompts):
+        # A single request goes over the pooled sync client
+        if len(prompts) == 1:
+            try:
+                return [self._complete(prompts[0])]
+            except Exception as e:
+                return [e]
+        return asyncio.run(self._agather_completions(prompts))
+    
+    async def _agather_completions(self, prompts):
+        try:
+            return await asyncio.gather(*[self._acomplete(prompt) for prompt in prompts], return_exceptions=True)
+        finally:
+            await self.aclose()
+    
+    async def aclose(self):
+        """Close the async HTTP client, if one was opened"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+    
+    def _build_gate_explanation_prompt(self, gate_type, difficulty_level, context_gates):
+        return _gate_explanation_prompt(gate_type, difficulty_level, tuple(context_gates or ()))
     
     def _build_qa_prompt(self, question, circuit_context, user_difficulty):
         prompt = f"""
@@ -102,6 +285,10 @@ class OpenRouterTutor:
         return prompt
     
     def _build_quiz_prompt(self, circuit, difficulty_level):
+        # Callers pass a circuit fetched with prefetch_related('gates') so this doesn't hit the DB
+        if settings.DEBUG:
+            assert 'gates' in getattr(circuit, '_prefetched_objects_cache', {}), \
+                "generate_quiz_question expects a circuit fetched with prefetch_related('gates')"
         gates_used = [gate.gate_type for gate in circuit.gates.all()]
         
         prompt = f"""
@@ -126,51 +313,109 @@ class OpenRouterTutor:
         
         return prompt
     
+    def _build_payload(self, prompt, max_tokens):
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "max_tokens": max_tokens,
+            "temperature": 0.7
+        }
+    
+    @_retry_transient
+    def _complete(self, prompt, max_tokens=500):
+        """POST a chat completion and return its text, raising on any failure"""
+        response = _HTTP.post(
+            f"{self.base_url}/chat/completions",
+            json=self._build_payload(prompt, max_tokens)
+        )
+        if response.status_code != 200:
+            raise OpenRouterError(f"OpenRouter API error {response.status_code}: {response.text}")
+        return response.json()['choices'][0]['message']['content']
+    
     def _call_openrouter(self, prompt, max_tokens=500):
         if not self.is_configured:
             return self._fallback_response(prompt)
         
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "https://quantum-tutor.com",  # Required by OpenRouter
-                "X-Title": "Quantum Tutor"  # Required by OpenRouter
-            }
-            
-            data = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": max_tokens,
-                "temperature": 0.7
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                error_msg = f"OpenRouter API error {response.status_code}: {response.text}"
-                return self._fallback_response(prompt, error_msg)
+            return self._complete(prompt, max_tokens)
+        except Exception as e:
+            return self._fallback_response(prompt, self._error_message(e))
+    
+    def stream_openrouter(self, prompt, max_tokens=500):
+        """Yield completion text chunks from OpenRouter's server-sent event stream"""
+        if not self.is_configured:
+            yield self._fallback_response(prompt)
+            return
+        
+        data = self._build_payload(prompt, max_tokens)
+        data["stream"] = True
+        
+        try:
+            with _HTTP.stream("POST", f"{self.base_url}/chat/completions", json=data) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise OpenRouterError(f"OpenRouter API error {response.status_code}: {response.text}")
                 
+                for line in response.iter_lines():
+                    # Skip keep-alive comments and blank separators
+                    if not line.startswith("data: "):
+                        continue
+                    payload = line[6:]
+                    if payload == "[DONE]":
+                        break
+                    content = json.loads(payload)['choices'][0]['delta'].get('content')
+                    if content:
+                        yield content
         except Exception as e:
-            error_msg = f"OpenRouter connection error: {str(e)}"
-            return self._fallback_response(prompt, error_msg)
+            yield self._fallback_response(prompt, self._error_message(e))
+    
+    def _get_async_client(self):
+        # Created lazily so the client binds to the event loop that uses it; a shared
+        # tutor called from another loop gets a fresh client rather than a foreign one
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client_loop = loop
+            self._client = httpx.AsyncClient(
+                http2=True,
+                limits=_HTTP_LIMITS,
+                timeout=30,
+                headers=_build_headers(self.api_key)
+            )
+        return self._client
+    
+    @_retry_transient
+    async def _acomplete(self, prompt, max_tokens=500):
+        """Async variant of _complete"""
+        response = await self._get_async_client().post(
+            f"{self.base_url}/chat/completions",
+            json=self._build_payload(prompt, max_tokens)
+        )
+        if response.status_code != 200:
+            raise OpenRouterError(f"OpenRouter API error {response.status_code}: {response.text}")
+        return response.json()['choices'][0]['message']['content']
+    
+    async def _acall_openrouter(self, prompt, max_tokens=500):
+        if not self.is_configured:
+            return self._fallback_response(prompt)
+        
+        try:
+            return await self._acomplete(prompt, max_tokens)
+        except Exception as e:
+            return self._fallback_response(prompt, self._error_message(e))
+    
+    @staticmethod
+    def _error_message(error):
+        if isinstance(error, OpenRouterError):
+            return str(error)
+        return f"OpenRouter connection error: {str(error)}"
     
     def _parse_quiz_response(self, response):
         # Simple parsing of the quiz response
-        lines = response.split('\n')
         quiz_data = {
             'question': '',
             'options': [],
@@ -178,28 +423,24 @@ class OpenRouterTutor:
             'explanation': ''
         }
         
-        current_section = None
-        for line in lines:
-            line = line.strip()
-            if line.startswith('QUESTION:'):
-                current_section = 'question'
-                quiz_data['question'] = line.replace('QUESTION:', '').strip()
-            elif line.startswith('OPTIONS:'):
-                current_section = 'options'
-                options_text = line.replace('OPTIONS:', '').strip()
-                quiz_data['options'] = [opt.strip() for opt in options_text.split('|')]
-            elif line.startswith('CORRECT:'):
-                current_section = 'correct'
-                correct_text = line.replace('CORRECT:', '').strip()
+        for match in _QUIZ_SECTION_RE.finditer(response):
+            section = match.group(1)
+            first_line, *more_lines = match.group(2).split('\n')
+            text = first_line.strip()
+            if section == 'QUESTION':
+                quiz_data['question'] = text
+            elif section == 'OPTIONS':
+                quiz_data['options'] = [opt.strip() for opt in text.split('|')]
+            elif section == 'CORRECT':
                 try:
-                    quiz_data['correct_answer'] = int(correct_text)
+                    quiz_data['correct_answer'] = int(text)
                 except ValueError:
                     quiz_data['correct_answer'] = 0
-            elif line.startswith('EXPLANATION:'):
-                current_section = 'explanation'
-                quiz_data['explanation'] = line.replace('EXPLANATION:', '').strip()
-            elif current_section == 'explanation' and line:
-                quiz_data['explanation'] += ' ' + line
+            else:
+                # The explanation may continue over several lines
+                quiz_data['explanation'] = ' '.join(
+                    [text] + [line.strip() for line in more_lines if line.strip()]
+                )
         
         # Ensure we have at least 4 options
         while len(quiz_data['options']) < 4:
@@ -1,53 +1,188 @@
+import ast
+import asyncio
 import base64
+import builtins
+import hashlib
+import html
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from functools import lru_cache
 from io import BytesIO, StringIO
 import numpy as np
-from qiskit import QuantumCircuit, transpile
-from qiskit_aer import AerSimulator, Aer
+from django.core.cache import cache
+from qiskit import QuantumCircuit
+from qiskit.circuit import Gate, Measure
+from qiskit.circuit.library import Initialize, StatePreparation, UnitaryGate
+from qiskit.transpiler import generate_preset_pass_manager
 from qiskit.quantum_info import Statevector
-from qiskit.visualization import plot_histogram
-import json
-import traceback
-import matplotlib
-# Set non-interactive backend
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import sys
+
+# matplotlib, qiskit_aer and qiskit.visualization are imported where they are
+# used, so processes that never simulate or plot don't pay for them at startup
+
+# Non-interactive backend for every matplotlib import, user code included. matplotlib
+# reads MPLBACKEND when it is first imported; if it already was, switch it directly
+os.environ['MPLBACKEND'] = 'Agg'
+if 'matplotlib' in sys.modules:
+    sys.modules['matplotlib'].use('Agg')
+
+@lru_cache(maxsize=1)
+def _load_plotting():
+    """Import Figure and plot_histogram once, on first use"""
+    from matplotlib.figure import Figure
+    from qiskit.visualization import plot_histogram
+    return Figure, plot_histogram
+
+# Top-level packages user code may import
+ALLOWED_IMPORTS = frozenset({'qiskit', 'qiskit_aer', 'numpy', 'matplotlib', 'math', 'cmath'})
+
+def _check_imports(tree):
+    """Reject import statements outside ALLOWED_IMPORTS"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = ['.' * node.level + (node.module or '')]
+        else:
+            continue
+        for name in names:
+            if name.split('.')[0] not in ALLOWED_IMPORTS:
+                raise ValueError(f"Import of '{name}' is not allowed")
+
+@lru_cache(maxsize=256)
+def _compile_src(src_hash, qiskit_code):
+    """Validated code object for user source, so repeat executions skip parsing"""
+    tree = ast.parse(qiskit_code, '<user>')
+    _check_imports(tree)
+    return compile(tree, '<user>', 'exec')
+
+# print() is a no-op for parsing; swapping sys.stdout would also silence other threads
+_SILENT_BUILTINS = {**builtins.__dict__, 'print': lambda *args, **kwargs: None}
+
+@lru_cache(maxsize=64)
+def _compile_user_code(src_hash, qiskit_code):
+    """Execute user code once and return (first QuantumCircuit, locals) - SILENT VERSION"""
+    local_vars = {}
+    
+    exec(_compile_src(src_hash, qiskit_code), {'__builtins__': _SILENT_BUILTINS}, local_vars)
+    
+    # Use the first circuit found
+    for var_value in local_vars.values():
+        if isinstance(var_value, QuantumCircuit):
+            return var_value, local_vars
+    
+    raise ValueError("No QuantumCircuit found in code.")
+
+class _ModuleOverlay:
+    """Module proxy that serves some attributes from overrides and the rest from the module"""
+    def __init__(self, module, overrides):
+        self._module = module
+        self.__dict__.update(overrides)
+    
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+def _exec_builtins(module_overrides):
+    """Builtins for exec() whose __import__ hands out overlays instead of patching modules"""
+    def overlay_import(name, globals=None, locals=None, fromlist=(), level=0):
+        module = builtins.__import__(name, globals, locals, fromlist, level)
+        if fromlist and name in module_overrides:
+            return _ModuleOverlay(module, module_overrides[name])
+        return module
+    
+    return {**builtins.__dict__, '__import__': overlay_import}
+
+def _source_hash(qiskit_code):
+    return hashlib.blake2b(qiskit_code.encode(), digest_size=16).hexdigest()
+
+SIMULATION_CACHE_TIMEOUT = 3600
+
+# Dense statevectors need 16 * 2**n bytes; refuse rather than exhaust memory
+STATEVECTOR_MAX_QUBITS = 30
+
+# Circuits wider than this only report their STATEVECTOR_TOP_K most likely states
+STATEVECTOR_FULL_MAX_QUBITS = 12
+STATEVECTOR_TOP_K = 64
+
+# Circuits up to this width whose measurements are all final are sampled from
+# their statevector instead of being transpiled and run on Aer
+SAMPLED_MEASUREMENT_MAX_QUBITS = 20
+
+# Large-shot runs use a fixed seed so their cached counts are reproducible
+SEEDED_SHOTS_THRESHOLD = 10000
+MEASUREMENT_SEED = 1234
+
+def _param_key(param):
+    """Lossless, hashable form of an instruction parameter"""
+    # str() elides the middle of large arrays (unitaries, initialize vectors)
+    if isinstance(param, np.ndarray):
+        data = np.ascontiguousarray(param)
+        return ('ndarray', data.dtype.str, data.shape, hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest())
+    return (type(param).__name__, str(param))
+
+# Non-standard operations whose behaviour is fully given by their params
+_PARAM_DEFINED_OPERATIONS = (Measure, UnitaryGate, Initialize, StatePreparation)
+
+def _is_fingerprintable(operation):
+    """Whether name, params and ctrl_state pin down what operation does.
+    
+    Custom gates from to_gate(), control flow and library gates that keep extra
+    state (an operator, a base gate) can share a name yet behave differently.
+    """
+    return (
+        getattr(operation, '_standard_gate', None) is not None
+        or getattr(operation, '_standard_instruction_type', None) is not None
+        or isinstance(operation, _PARAM_DEFINED_OPERATIONS)
+    )
+
+def _fingerprint(circuit):
+    """Structural description of a circuit: register sizes, global phase plus every
+    instruction's name, qubit and clbit indices, parameters and control state.
+    
+    None for circuits with an operation that isn't fingerprintable; those are never cached.
+    """
+    qubit_indices = {qubit: index for index, qubit in enumerate(circuit.qubits)}
+    clbit_indices = {clbit: index for index, clbit in enumerate(circuit.clbits)}
+    instructions = []
+    for instruction in circuit.data:
+        operation = instruction.operation
+        if not _is_fingerprintable(operation):
+            return None
+        instructions.append((
+            operation.name,
+            tuple(qubit_indices[qubit] for qubit in instruction.qubits),
+            tuple(clbit_indices[clbit] for clbit in instruction.clbits),
+            tuple(_param_key(param) for param in operation.params),
+            getattr(operation, 'ctrl_state', None)
+        ))
+    return (circuit.num_qubits, circuit.num_clbits, str(circuit.global_phase), tuple(instructions))
+
+def _simulation_cache_key(prefix, circuit, *extra):
+    """Cache key for a simulation of circuit, stable across processes; None if uncacheable"""
+    fingerprint = _fingerprint(circuit)
+    if fingerprint is None:
+        return None
+    digest = hashlib.blake2b(repr(fingerprint).encode(), digest_size=16).hexdigest()
+    return ':'.join([prefix, digest, *map(str, extra)])
+
+def _cache_get(key):
+    return cache.get(key) if key is not None else None
+
+def _cache_set(key, value):
+    if key is not None:
+        cache.set(key, value, timeout=SIMULATION_CACHE_TIMEOUT)
 
 class CircuitParser:
     @staticmethod
     def parse_qiskit_code(qiskit_code):
         """Parse Qiskit code and extract circuit information - SILENT VERSION"""
         try:
-            # Redirect stdout and stderr during parsing
-            old_stdout = sys.stdout
-            old_stderr = sys.stderr
-            sys.stdout = StringIO()
-            sys.stderr = StringIO()
-            
-            local_vars = {}
-            
-            try:
-                # Execute silently
-                exec(qiskit_code, {}, local_vars)
-                
-                # Find QuantumCircuit objects
-                circuits = {}
-                for var_name, var_value in local_vars.items():
-                    if isinstance(var_value, QuantumCircuit):
-                        circuits[var_name] = var_value
-                
-                if not circuits:
-                    raise ValueError("No QuantumCircuit found in code.")
-                
-                # Use the first circuit found
-                circuit_name, circuit = next(iter(circuits.items()))
-                return circuit
-                
-            finally:
-                # Restore and discard output
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-                
+            # Identical source is executed only once per process; hand out a copy so
+            # callers can't mutate the cached circuit
+            return _compile_user_code(_source_hash(qiskit_code), qiskit_code)[0].copy()
         except Exception as e:
             raise ValueError(f"Error parsing Qiskit code: {str(e)}")
     
@@ -56,19 +191,29 @@ class CircuitParser:
         """Extract gate information from a QuantumCircuit object"""
         gates = []
         step_order = 0
+        # Built once per circuit instead of a find_bit() lookup per qubit
+        qubit_indices = {qubit: index for index, qubit in enumerate(circuit.qubits)}
         
         for instruction in circuit.data:
+            operation = instruction.operation
             gate_info = {
-                'gate_type': instruction.operation.name,
-                'qubits': [circuit.find_bit(qubit).index for qubit in instruction.qubits],
+                'gate_type': operation.name,
+                'qubits': [qubit_indices[qubit] for qubit in instruction.qubits],
                 'step_order': step_order,
                 'parameters': {}
             }
             
-            if hasattr(instruction.operation, 'params') and instruction.operation.params:
-                gate_info['parameters'] = {
-                    'params': [float(p) for p in instruction.operation.params]
-                }
+            params = getattr(operation, 'params', None)
+            if params:
+                values = np.asarray(params)
+                # One call for the usual list of real angles; anything else (complex
+                # matrices, unbound parameters) goes through float() so it raises
+                # instead of silently losing data
+                if values.ndim == 1 and values.dtype.kind in 'biuf':
+                    values = values.astype(np.float64).tolist()
+                else:
+                    values = [float(param) for param in params]
+                gate_info['parameters'] = {'params': values}
             
             gates.append(gate_info)
             step_order += 1
@@ -78,23 +223,179 @@ class CircuitParser:
     @staticmethod
     def generate_circuit_diagram(circuit):
         """Generate text diagram of the circuit"""
+        # Register names and gate labels show up in the drawing, so they are part of the key
+        registers = [f'{register.name}={register.size}' for register in circuit.qregs + circuit.cregs]
+        labels = [repr(getattr(instruction.operation, 'label', None)) for instruction in circuit.data]
+        key = _simulation_cache_key('diagram', circuit, *registers, _source_hash(''.join(labels)))
+        diagram = _cache_get(key)
+        if diagram is not None:
+            return diagram
+        
         try:
-            text_diagram = str(circuit)
-            return f"<pre class='font-mono text-sm'>{text_diagram}</pre>"
+            # No folding: the <pre> scrolls horizontally instead of wrapping at 80 columns
+            text_diagram = html.escape(str(circuit.draw(output='text', fold=-1)))
+            diagram = f"<pre class='font-mono text-sm'>{text_diagram}</pre>"
         except Exception as e:
-            return f"<pre>Error generating diagram: {str(e)}</pre>"
+            return f"<pre>Error generating diagram: {html.escape(str(e))}</pre>"
+        
+        _cache_set(key, diagram)
+        return diagram
+
+TRANSPILE_OPTIMIZATION_LEVEL = 1
+TRANSPILE_CACHE_SIZE = 128
+
+_PASS_MANAGERS = {}
+_TRANSPILE_CACHE = OrderedDict()
+_TRANSPILE_CACHE_LOCK = threading.Lock()
+
+def _pass_manager(backend):
+    """Preset pass manager for backend, built once per backend name"""
+    pass_manager = _PASS_MANAGERS.get(backend.name)
+    if pass_manager is None:
+        pass_manager = generate_preset_pass_manager(
+            backend=backend, optimization_level=TRANSPILE_OPTIMIZATION_LEVEL
+        )
+        _PASS_MANAGERS[backend.name] = pass_manager
+    return pass_manager
+
+def _transpile(circuit, backend):
+    """Transpile circuit for backend, reusing earlier results for identical circuits"""
+    fingerprint = _fingerprint(circuit)
+    if fingerprint is None:
+        return _pass_manager(backend).run(circuit)
+    
+    key = (fingerprint, backend.name, TRANSPILE_OPTIMIZATION_LEVEL)
+    with _TRANSPILE_CACHE_LOCK:
+        transpiled = _TRANSPILE_CACHE.get(key)
+        if transpiled is not None:
+            _TRANSPILE_CACHE.move_to_end(key)
+            return transpiled.copy()
+    
+    transpiled = _pass_manager(backend).run(circuit)
+    with _TRANSPILE_CACHE_LOCK:
+        # Store a copy so callers mutating the result can't corrupt the cache
+        _TRANSPILE_CACHE[key] = transpiled.copy()
+        if len(_TRANSPILE_CACHE) > TRANSPILE_CACHE_SIZE:
+            _TRANSPILE_CACHE.popitem(last=False)
+    return transpiled
+
+# PNG compression in Agg releases the GIL, so several plots render in parallel
+_PLOT_EXECUTOR = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
+
+_PLOT_BUFFERS = threading.local()
+
+def _plot_buffer():
+    """Empty BytesIO reused by the current plot worker thread"""
+    buf = getattr(_PLOT_BUFFERS, 'buf', None)
+    if buf is None:
+        buf = _PLOT_BUFFERS.buf = BytesIO()
+    buf.seek(0)
+    buf.truncate(0)
+    return buf
+
+def _render_plot(fig, title):
+    """Encode a matplotlib figure as an embeddable base64 PNG"""
+    buf = _plot_buffer()
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=90, facecolor='white')
+    # Encode straight from the buffer's memory instead of a getvalue() copy
+    view = buf.getbuffer()
+    try:
+        image_base64 = base64.b64encode(view).decode('ascii')
+    finally:
+        # An exported view would block the next truncate()
+        view.release()
+    
+    return f'<div style="margin: 20px 0; text-align: center;"><h4>{title}</h4><img src="data:image/png;base64,{image_base64}" style="max-width: 100%; border: 1px solid #ccc; border-radius: 8px;"></div>'
+
+class _MockPlt:
+    """Stand-in for pyplot in user code; plots are rendered through plot_histogram"""
+    def show(self): 
+        return "Plot displayed in web interface"
+    def figure(self, *args, **kwargs): 
+        return None
+    def subplots(self, *args, **kwargs): 
+        return (None, None)
+    def title(self, *args, **kwargs): 
+        return None
+    def xlabel(self, *args, **kwargs): 
+        return None
+    def ylabel(self, *args, **kwargs): 
+        return None
+
+_MOCK_PLT = _MockPlt()
+
+# Variable names checked before scanning all of the user's locals for a circuit
+CIRCUIT_VARIABLE_NAMES = ('qc', 'circuit', 'qcircuit')
+
+def _find_circuit_name(local_vars):
+    """Name of a QuantumCircuit in local_vars, or None"""
+    for name in CIRCUIT_VARIABLE_NAMES:
+        if isinstance(local_vars.get(name), QuantumCircuit):
+            return name
+    for name, value in local_vars.items():
+        if isinstance(value, QuantumCircuit):
+            return name
+    return None
+
+# stream_user_code event kinds and the execute_user_code fields they fill
+_STREAM_FIELDS = {
+    'text': 'text_output',
+    'circuit': 'circuit',
+    'statevector': 'statevector',
+    'counts': 'counts'
+}
+
+@lru_cache(maxsize=16)
+def _bitstrings(num_qubits):
+    """Basis-state labels '00..0' to '11..1', built once per qubit count"""
+    state_format = f'0{num_qubits}b'
+    return tuple(format(i, state_format) for i in range(1 << num_qubits))
+
+@lru_cache(maxsize=1)
+def _aer_simulator():
+    """Process-wide AerSimulator; Aer manages its own C++ threads per run"""
+    import qiskit_aer
+    return qiskit_aer.AerSimulator(method='automatic', max_parallel_threads=0)
 
 class CircuitSimulator:
     def __init__(self):
-        self.simulator = AerSimulator()
+        self.simulator = _aer_simulator()
     
     def execute_user_code(self, qiskit_code):
         """Execute user Qiskit code and return results"""
+        output_data = {
+            'text_output': '',
+            'plots': [],
+            'circuit': None,
+            'statevector': None,
+            'counts': None
+        }
+        for kind, value in self.stream_user_code(qiskit_code):
+            if kind == 'plot':
+                output_data['plots'].append(value)
+            else:
+                output_data[_STREAM_FIELDS[kind]] = value
+        return output_data
+    
+    def stream_user_code(self, qiskit_code):
+        """Execute user Qiskit code, yielding (kind, value) pairs as each result is ready.
+        
+        Kinds are 'text', 'circuit', 'statevector' and 'counts', then one 'plot'
+        per rendered figure in the order the code drew them.
+        """
+        src_hash = _source_hash(qiskit_code)
+        cached = cache.get(f'exec:{src_hash}')
+        if cached is not None:
+            for kind, field in _STREAM_FIELDS.items():
+                yield kind, cached[field]
+            for plot in cached['plots']:
+                yield 'plot', plot
+            return
+        
         # Capture all output
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
         stdout_capture = StringIO()
         stderr_capture = StringIO()
+        pending_plots = []
         
         output_data = {
             'text_output': '',
@@ -104,117 +405,240 @@ class CircuitSimulator:
             'counts': None
         }
         
-        try:
-            # Redirect output
-            sys.stdout = stdout_capture
-            sys.stderr = stderr_capture
-            
-            # Create local namespace with custom functions
-            local_vars = {}
-            
-            # Custom plot_histogram that returns base64
-            def custom_plot_histogram(counts, title='Histogram'):
-                try:
-                    fig = plot_histogram(counts, title=title)
-                    buf = BytesIO()
-                    fig.savefig(buf, format='png', bbox_inches='tight', dpi=100)
-                    buf.seek(0)
-                    image_base64 = base64.b64encode(buf.getvalue()).decode()
-                    plt.close(fig)
-                    
-                    plot_html = f'<div style="margin: 20px 0; text-align: center;"><h4>{title}</h4><img src="data:image/png;base64,{image_base64}" style="max-width: 100%; border: 1px solid #ccc; border-radius: 8px;"></div>'
-                    output_data['plots'].append(plot_html)
-                    return "Plot generated"
-                except Exception as e:
-                    return f"Plot error: {str(e)}"
-            
-            # PATCH: Replace qiskit.visualization.plot_histogram globally
-            import qiskit.visualization
-            qiskit.visualization.plot_histogram = custom_plot_histogram
-            
-            # Custom plt.show that does nothing
-            class MockPlt:
-                def show(self): 
-                    return "Plot displayed in web interface"
-                def figure(self, *args, **kwargs): 
-                    return None
-                def subplots(self, *args, **kwargs): 
-                    return (None, None)
-                def title(self, *args, **kwargs): 
-                    return None
-                def xlabel(self, *args, **kwargs): 
-                    return None
-                def ylabel(self, *args, **kwargs): 
-                    return None
-            
-            # Add custom functions to local vars
-            local_vars['plot_histogram'] = custom_plot_histogram
-            local_vars['plt'] = MockPlt()
-            
-            # Execute the code
-            exec(qiskit_code, {}, local_vars)
-            
-            # Capture any results
-            for var_name, var_value in local_vars.items():
-                if isinstance(var_value, QuantumCircuit):
-                    output_data['circuit'] = var_name
-                elif var_name == 'statevector':
-                    output_data['statevector'] = str(var_value)
-                elif var_name == 'counts' and isinstance(var_value, dict):
-                    output_data['counts'] = var_value
-            
-        except Exception as e:
-            # Capture errors in output
-            print(f"Execution error: {str(e)}")
-        finally:
-            # Restore stdout/stderr and get captured output
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
-            
-            stdout_content = stdout_capture.getvalue()
-            stderr_content = stderr_capture.getvalue()
-            
-            output_data['text_output'] = stdout_content
-            if stderr_content:
-                output_data['text_output'] += "\nErrors:\n" + stderr_content
+        # Custom plot_histogram that returns base64
+        def custom_plot_histogram(counts, title='Histogram'):
+            try:
+                Figure, plot_histogram = _load_plotting()
+                # A standalone Figure stays out of pyplot's global figure registry
+                fig = Figure(figsize=(7, 5))
+                plot_histogram(counts, title=title, ax=fig.add_subplot())
+                # PNG encoding happens in the background while the user code keeps running
+                pending_plots.append(_PLOT_EXECUTOR.submit(_render_plot, fig, title))
+                return "Plot generated"
+            except Exception as e:
+                return f"Plot error: {str(e)}"
         
-        return output_data
+        # Custom functions are handed to this execution only; "from qiskit.visualization
+        # import plot_histogram" gets the custom one without patching the shared module
+        exec_globals = {
+            '__builtins__': _exec_builtins({
+                'qiskit.visualization': {'plot_histogram': custom_plot_histogram}
+            }),
+            'plot_histogram': custom_plot_histogram,
+            'plt': _MOCK_PLT
+        }
+        local_vars = {}
+        
+        with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
+            try:
+                # Execute the code
+                exec(_compile_src(src_hash, qiskit_code), exec_globals, local_vars)
+                
+                # Capture any results, trying the conventional circuit names first
+                output_data['circuit'] = _find_circuit_name(local_vars)
+                if 'statevector' in local_vars:
+                    output_data['statevector'] = str(local_vars['statevector'])
+                if isinstance(local_vars.get('counts'), dict):
+                    output_data['counts'] = local_vars['counts']
+                
+            except Exception as e:
+                # Capture errors in output
+                print(f"Execution error: {str(e)}")
+        
+        output_data['text_output'] = stdout_capture.getvalue()
+        stderr_content = stderr_capture.getvalue()
+        if stderr_content:
+            output_data['text_output'] += "\nErrors:\n" + stderr_content
+        
+        for kind, field in _STREAM_FIELDS.items():
+            yield kind, output_data[field]
+        
+        # Each plot goes out as soon as its background render finishes
+        for future in pending_plots:
+            try:
+                plot = future.result()
+            except Exception:
+                continue
+            output_data['plots'].append(plot)
+            yield 'plot', plot
+        
+        cache.set(f'exec:{src_hash}', output_data, timeout=SIMULATION_CACHE_TIMEOUT)
     
     def simulate_statevector(self, circuit):
-        """Simulate circuit and return statevector"""
+        """Simulate circuit and return statevector as parallel states/real/imag/prob lists"""
+        key = _simulation_cache_key('statevector', circuit)
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+        
+        if circuit.num_qubits > STATEVECTOR_MAX_QUBITS:
+            raise ValueError(
+                f"Statevector simulation failed: circuits are limited to {STATEVECTOR_MAX_QUBITS} qubits"
+            )
+        
         try:
-            statevector_circuit = circuit.copy()
-            statevector_circuit.remove_final_measurements()
+            # Only copy when there are measurements to strip
+            if 'measure' in circuit.count_ops():
+                statevector_circuit = circuit.copy()
+                statevector_circuit.remove_final_measurements()
+            else:
+                statevector_circuit = circuit
             
             statevector = Statevector.from_instruction(statevector_circuit)
             
-            statevector_json = []
-            for i, amplitude in enumerate(statevector):
-                statevector_json.append({
-                    'state': format(i, f'0{circuit.num_qubits}b'),
-                    'amplitude_real': float(amplitude.real),
-                    'amplitude_imag': float(amplitude.imag),
-                    'probability': float(abs(amplitude)**2)
-                })
+            # Vectorized over all amplitudes; tolist() yields plain Python floats
+            amplitudes = np.asarray(statevector.data, dtype=np.complex128)
+            reals = amplitudes.real.astype(np.float64, copy=False)
+            imags = amplitudes.imag.astype(np.float64, copy=False)
+            probabilities = reals * reals + imags * imags
             
-            return statevector_json
+            # Past the threshold only the most likely basis states are returned
+            truncated = circuit.num_qubits > STATEVECTOR_FULL_MAX_QUBITS
+            if truncated:
+                top_k = min(STATEVECTOR_TOP_K, amplitudes.size)
+                indices = np.argpartition(-probabilities, top_k - 1)[:top_k]
+                indices = indices[np.argsort(-probabilities[indices])]
+                reals, imags, probabilities = reals[indices], imags[indices], probabilities[indices]
+                state_format = f'0{circuit.num_qubits}b'
+                states = [format(i, state_format) for i in indices.tolist()]
+            else:
+                states = list(_bitstrings(circuit.num_qubits))
+            
+            # Parallel arrays rather than a dict per amplitude
+            statevector_json = {
+                'n_qubits': circuit.num_qubits,
+                'states': states,
+                'real': reals.tolist(),
+                'imag': imags.tolist(),
+                'prob': probabilities.tolist()
+            }
+            if truncated:
+                statevector_json['other_prob'] = max(0.0, 1.0 - float(probabilities.sum()))
         except Exception as e:
             raise ValueError(f"Statevector simulation failed: {str(e)}")
+        
+        _cache_set(key, statevector_json)
+        return statevector_json
+    
+    def simulate(self, circuit, shots=1024):
+        """Run the statevector and measurement simulations concurrently"""
+        return asyncio.run(self._asimulate(circuit, shots))
+    
+    async def _asimulate(self, circuit, shots):
+        # Sampled circuits reuse the statevector's probabilities, as long as it isn't truncated
+        if circuit.num_qubits <= STATEVECTOR_FULL_MAX_QUBITS and self._unitary_body(circuit) is not None:
+            statevector = await asyncio.to_thread(self.simulate_statevector, circuit)
+            probabilities, counts = await asyncio.to_thread(
+                self.simulate_measurements, circuit, shots, statevector['prob']
+            )
+            return statevector, probabilities, counts
+        
+        statevector, (probabilities, counts) = await asyncio.gather(
+            asyncio.to_thread(self.simulate_statevector, circuit),
+            self.asimulate_measurements(circuit, shots)
+        )
+        return statevector, probabilities, counts
+    
+    async def asimulate_measurements(self, circuit, shots=1024):
+        """Async variant of simulate_measurements; Aer runs in a worker thread"""
+        return await asyncio.to_thread(self.simulate_measurements, circuit, shots)
     
-    def simulate_measurements(self, circuit, shots=1024):
-        """Simulate measurements and return probabilities"""
+    def simulate_measurements(self, circuit, shots=1024, statevector_probabilities=None):
+        """Simulate measurements and return (probabilities, counts).
+        
+        statevector_probabilities, the full probability vector of circuit's
+        statevector, lets unitary circuits be sampled without recomputing it.
+        """
+        seed = MEASUREMENT_SEED if shots > SEEDED_SHOTS_THRESHOLD else None
+        # Both dicts are cached together; the cache hands back fresh copies
+        key = _simulation_cache_key('counts', circuit, shots, seed)
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            measurement_circuit = circuit.copy()
-            if not any(gate.name == 'measure' for gate in measurement_circuit.data):
-                measurement_circuit.measure_all()
+            counts = self._sample_final_measurements(circuit, shots, seed, statevector_probabilities)
+            if counts is not None:
+                probabilities = {state: count/shots for state, count in counts.items()}
+                _cache_set(key, (probabilities, counts))
+                return probabilities, counts
             
-            backend = AerSimulator()
-            transpiled_circuit = transpile(measurement_circuit, backend)
-            job = backend.run(transpiled_circuit, shots=shots)
+            # Measured circuits are used as-is (the caller's circuit is only read, never
+            # mutated); otherwise measure_all builds a new circuit with the measurements
+            if 'measure' in circuit.count_ops():
+                measurement_circuit = circuit
+            else:
+                measurement_circuit = circuit.measure_all(inplace=False)
+            
+            backend = self.simulator
+            transpiled_circuit = _transpile(measurement_circuit, backend)
+            job = backend.run(transpiled_circuit, shots=shots, seed_simulator=seed)
             result = job.result()
-            counts = result.get_counts()
+            counts = dict(result.get_counts())
             
             probabilities = {state: count/shots for state, count in counts.items()}
-            return probabilities, counts
         except Exception as e:
-            raise ValueError(f"Measurement simulation failed: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Measurement simulation failed: {str(e)}")
+        
+        _cache_set(key, (probabilities, counts))
+        return probabilities, counts
+    
+    @staticmethod
+    def _unitary_body(circuit):
+        """circuit without its final measurements if the rest is gates only, else None"""
+        if circuit.num_qubits > SAMPLED_MEASUREMENT_MAX_QUBITS or len(circuit.cregs) > 1:
+            return None
+        
+        body = circuit.remove_final_measurements(inplace=False)
+        # Mid-circuit measurements, resets, initialize and control flow are not
+        # unitary; the sampled statevector would follow a single branch of them
+        for instruction in body.data:
+            operation = instruction.operation
+            if not isinstance(operation, Gate) and operation.name != 'barrier':
+                return None
+        return body
+    
+    @classmethod
+    def _sample_final_measurements(cls, circuit, shots, seed=None, probabilities=None):
+        """Counts sampled from the statevector, or None when the circuit needs Aer.
+        
+        probabilities may be passed in when the statevector was already computed.
+        """
+        body = cls._unitary_body(circuit)
+        if body is None:
+            return None
+        
+        qubit_indices = {qubit: index for index, qubit in enumerate(circuit.qubits)}
+        clbit_indices = {clbit: index for index, clbit in enumerate(circuit.clbits)}
+        measured = {}
+        for instruction in circuit.data:
+            if instruction.operation.name == 'measure':
+                measured[clbit_indices[instruction.clbits[0]]] = qubit_indices[instruction.qubits[0]]
+        suffix = ''
+        if measured:
+            num_clbits = circuit.num_clbits
+        else:
+            # Same layout measure_all() would produce: a new register printed ahead
+            # of the circuit's own, still all-zero register
+            measured = {index: index for index in range(circuit.num_qubits)}
+            num_clbits = circuit.num_qubits
+            if circuit.num_clbits:
+                suffix = ' ' + '0' * circuit.num_clbits
+        
+        if probabilities is None:
+            try:
+                probabilities = Statevector.from_instruction(body).probabilities()
+            except Exception:
+                return None
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        
+        outcomes = np.random.default_rng(seed).multinomial(shots, probabilities / probabilities.sum())
+        counts = {}
+        for index in np.flatnonzero(outcomes).tolist():
+            bits = ['0'] * num_clbits
+            for clbit, qubit in measured.items():
+                if index >> qubit & 1:
+                    bits[num_clbits - 1 - clbit] = '1'
+            state = ''.join(bits) + suffix
+            counts[state] = counts.get(state, 0) + int(outcomes[index])
+        return counts
\ No newline at end of file
@@ -0,0 +1,20 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+
+
+def ndjson_line(obj):
+    """One newline-terminated JSON document"""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON, for actions that stream their results line by line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Plain responses (errors, mostly) come out as a single line
+        if data is None:
+            return b''
+        return ndjson_line(data)
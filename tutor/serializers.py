@@ -26,6 +26,9 @@ class QuantumCircuitSerializer(serializers.ModelSerializer):
         ]
 
 class SimulationResultSerializer(serializers.ModelSerializer):
+    """statevector holds parallel ``states``/``real``/``imag``/``prob`` lists (older results
+    are a list of per-state dicts). Circuits wider than 12 qubits carry only the 64 most
+    likely basis states plus the remaining probability as ``other_prob``"""
     class Meta:
         model = SimulationResult
         fields = ['id', 'statevector', 'probabilities', 'counts', 'shots', 'created_at']
@@ -0,0 +1,117 @@
+from celery import shared_task
+from django.db.models import Prefetch
+from .models import User, QuantumCircuit, CircuitGate, QASession, QuizQuestion
+from .serializers import QuizQuestionSerializer
+from .ai_tutor import get_tutor
+
+def explain_circuit_gates(circuit, difficulty_level, stored_only=False):
+    """Explanations for every gate of circuit, each in the context of the gates before it.
+    
+    With stored_only, nothing is generated and None is returned unless every
+    explanation is already stored.
+    """
+    tutor = get_tutor()
+    # One query for just the columns used, as tuples rather than model instances
+    gates = list(circuit.gates.order_by('step_order').values_list('gate_type', 'qubits', 'step_order'))
+    gate_types = [gate_type for gate_type, _, _ in gates]
+    # Each gate's context is the slice of gate types before it
+    requests = [(gate_type, gate_types[:i]) for i, gate_type in enumerate(gate_types)]
+    
+    if stored_only:
+        texts = tutor.stored_gate_explanations(requests, difficulty_level)
+        if None in texts:
+            return None
+    else:
+        # Fan the OpenRouter calls out concurrently instead of one round trip per gate
+        texts = tutor.generate_gate_explanations(requests, difficulty_level)
+    
+    explanations = []
+    for (gate_type, qubits, step_order), explanation in zip(gates, texts):
+        explanations.append({
+            'gate': gate_type,
+            'qubits': qubits,
+            'step_order': step_order,
+            'explanation': explanation
+        })
+    
+    return explanations
+
+def handle_question(user, question, circuit_id=None):
+    """Answer question for user, optionally about one of their circuits, and record the session.
+    
+    Returns (answer, qa_session).
+    """
+    tutor = get_tutor()
+    circuit = None
+    circuit_context = None
+    
+    if circuit_id:
+        try:
+            circuit = QuantumCircuit.objects.only('id', 'num_qubits', 'title').get(id=circuit_id, user=user)
+            circuit_context = {
+                'num_qubits': circuit.num_qubits,
+                'gates': list(circuit.gates.order_by('step_order').values_list('gate_type', flat=True)),
+                'purpose': circuit.title
+            }
+        except QuantumCircuit.DoesNotExist:
+            pass
+    
+    try:
+        answer = tutor.answer_question(question, circuit_context, user.difficulty_level)
+    except Exception as e:
+        answer = f"AI service error: {str(e)}"
+    
+    # Save Q&A session; passing the loaded circuit lets templates read its title
+    qa_session = QASession.objects.create(
+        user=user,
+        circuit=circuit,
+        question=question,
+        answer=answer,
+        context_gates=circuit_context['gates'] if circuit_context else []
+    )
+    
+    return answer, qa_session
+
+def create_quiz_question(circuit, difficulty_level):
+    """Generate and store a quiz question; circuit must be fetched with its gates prefetched"""
+    tutor = get_tutor()
+    quiz_data = tutor.generate_quiz_question(circuit, difficulty_level)
+    
+    return QuizQuestion.objects.create(
+        circuit=circuit,
+        question=quiz_data['question'],
+        options=quiz_data['options'],
+        correct_answer=quiz_data['correct_answer'],
+        explanation=quiz_data['explanation'],
+        difficulty_level=difficulty_level
+    )
+
+def quiz_circuit_queryset():
+    """Circuits with just the gate columns the quiz prompt reads prefetched"""
+    return QuantumCircuit.objects.prefetch_related(
+        Prefetch('gates', queryset=CircuitGate.objects.only('circuit', 'gate_type', 'step_order'))
+    )
+
+# Celery tasks so the AI round trips can run outside the request/response cycle
+
+@shared_task
+def explain_circuit_gates_task(circuit_id, user_id):
+    user = User.objects.only('difficulty_level').get(pk=user_id)
+    circuit = QuantumCircuit.objects.get(id=circuit_id, user_id=user_id)
+    return explain_circuit_gates(circuit, user.difficulty_level)
+
+@shared_task
+def answer_question_task(user_id, question, circuit_id=None):
+    user = User.objects.get(pk=user_id)
+    answer, qa_session = handle_question(user, question, circuit_id)
+    return {
+        'question': question,
+        'answer': answer,
+        'session_id': qa_session.id
+    }
+
+@shared_task
+def generate_quiz_task(circuit_id, user_id):
+    user = User.objects.only('difficulty_level').get(pk=user_id)
+    circuit = quiz_circuit_queryset().get(id=circuit_id, user_id=user_id)
+    return QuizQuestionSerializer(create_quiz_question(circuit, user.difficulty_level)).data
@@ -1,3 +1,70 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from qiskit import QuantumCircuit as QiskitCircuit
+from .models import User, QuantumCircuit, CircuitGate
+from .qiskit_utils import CircuitSimulator, _aer_simulator, _transpile
 
-# Create your tests here.
+
+class CircuitAdminQueryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+    
+    def _change_page_queries(self, num_gates):
+        circuit = QuantumCircuit.objects.create(
+            user=self.admin, title=f'{num_gates} gates', qiskit_code='', num_qubits=2
+        )
+        CircuitGate.objects.bulk_create(
+            CircuitGate(circuit=circuit, gate_type='rx', qubits=[0], step_order=i, parameters={'params': [0.5]})
+            for i in range(num_gates)
+        )
+        url = reverse('admin:tutor_quantumcircuit_change', args=[circuit.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+    
+    def test_change_page_queries_do_not_grow_with_gates(self):
+        self._change_page_queries(1)  # Warms per-process caches such as content types
+        self.assertEqual(self._change_page_queries(30), self._change_page_queries(1))
+
+
+def _oracle_circuit(gate):
+    """One-qubit circuit applying a custom gate named 'oracle' whose body is gate"""
+    oracle = QiskitCircuit(1, name='oracle')
+    getattr(oracle, gate)(0)
+    circuit = QiskitCircuit(1)
+    circuit.append(oracle.to_gate(), [0])
+    return circuit
+
+
+class SimulationCacheTests(TestCase):
+    def test_same_named_custom_gates_are_not_shared(self):
+        simulator = CircuitSimulator()
+        self.assertEqual(simulator.simulate_statevector(_oracle_circuit('x'))['prob'], [0.0, 1.0])
+        probabilities = simulator.simulate_statevector(_oracle_circuit('h'))['prob']
+        self.assertAlmostEqual(probabilities[0], 0.5)
+        self.assertAlmostEqual(probabilities[1], 0.5)
+    
+    def test_same_named_custom_gates_are_transpiled_separately(self):
+        backend = _aer_simulator()
+        x_oracle = _transpile(_oracle_circuit('x'), backend)
+        h_oracle = _transpile(_oracle_circuit('h'), backend)
+        self.assertNotEqual(dict(x_oracle.count_ops()), dict(h_oracle.count_ops()))
+
+
+class MeasurementSamplingTests(TestCase):
+    def test_sampled_keys_match_aer_for_permuted_clbits(self):
+        circuit = QiskitCircuit(3, 3)
+        circuit.x(0)
+        circuit.h(1)
+        circuit.measure(0, 2)
+        circuit.measure(1, 0)  # Qubit 2 is never measured, so clbit 1 stays 0
+        
+        sampled = CircuitSimulator._sample_final_measurements(circuit, 1024, seed=1)
+        backend = _aer_simulator()
+        aer_counts = backend.run(_transpile(circuit, backend), shots=1024, seed_simulator=1).result().get_counts()
+        self.assertEqual(set(sampled), set(aer_counts))
+        self.assertEqual(set(sampled), {'100', '101'})
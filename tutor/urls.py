@@ -28,6 +28,12 @@ urlpatterns = [
     path('api/qa/ask/', 
          views.QASessionViewSet.as_view({'post': 'ask_question'}), 
          name='qa-ask'),
+    path('api/tasks/<str:task_id>/', 
+         views.task_status, 
+         name='task-status'),
+    path('api/explanations/stream/', 
+         views.gate_explanation_stream, 
+         name='gate-explanation-stream'),
     path('api/circuits/<int:circuit_id>/execute_code/', 
          views.QuantumCircuitViewSet.as_view({'post': 'execute_code'}), 
          name='circuit-execute-code'),
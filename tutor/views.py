@@ -1,14 +1,24 @@
+import hashlib
+from datetime import timedelta
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 from django.shortcuts import render, get_object_or_404
+from celery.result import AsyncResult
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from rest_framework.decorators import api_view, permission_classes
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
 from .models import (
     User, QuantumCircuit, CircuitGate, Explanation, 
-    SimulationResult, QASession, QuizQuestion
+    SimulationResult, QASession, QuizQuestion, QueuedTask
 )
 from .serializers import (
     QuantumCircuitSerializer, CircuitGateSerializer,
@@ -16,12 +26,23 @@ from .serializers import (
     QuizQuestionSerializer
 )
 from .qiskit_utils import CircuitParser, CircuitSimulator
-from .ai_tutor import AITutor
+from .renderers import NDJSONRenderer, ndjson_line
+from .ai_tutor import get_tutor
+from .tasks import (
+    explain_circuit_gates, handle_question, create_quiz_question, quiz_circuit_queryset,
+    explain_circuit_gates_task, answer_question_task, generate_quiz_task
+)
 
 @login_required
 def dashboard(request):
     """Main dashboard view"""
-    circuits = QuantumCircuit.objects.filter(user=request.user)
+    # Cards show a few columns plus gate and simulation status, all from one query
+    circuits = QuantumCircuit.objects.filter(user=request.user).only(
+        'id', 'title', 'num_qubits', 'created_at', 'updated_at'
+    ).annotate(
+        gate_count=Count('gates'),
+        simulated=Exists(SimulationResult.objects.filter(circuit=OuterRef('pk')))
+    ).order_by('-updated_at')
     return render(request, 'tutor/dashboard.html', {'circuits': circuits})
 
 @login_required
@@ -74,7 +95,65 @@ def create_circuit_api(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+def _wants_async(request):
+    """Whether the client asked (?async=1) for a queued task instead of waiting on the AI"""
+    return request.query_params.get('async') in ('1', 'true')
+
+def _enqueue(request, task, *args):
+    """Queue task on Celery and answer 202 with the id to poll at task-status"""
+    result = task.delay(*args)
+    # Kept in the database so any worker can answer the status poll
+    QueuedTask.objects.create(task_id=result.id, user=request.user)
+    _prune_queued_tasks(task.app.conf.result_expires)
+    return Response({'task_id': result.id, 'status': 'queued'}, status=status.HTTP_202_ACCEPTED)
+
+def _prune_queued_tasks(result_expires):
+    """Drop ownership rows of tasks nobody polled once the result backend has expired them"""
+    if result_expires is None:
+        return
+    if not isinstance(result_expires, timedelta):
+        result_expires = timedelta(seconds=result_expires)
+    QueuedTask.objects.filter(created_at__lt=timezone.now() - result_expires).delete()
+
+def _ndjson_code_events(events):
+    """Encode stream_user_code events as one JSON object per line"""
+    try:
+        for kind, value in events:
+            if kind == 'circuit':
+                yield ndjson_line({'type': 'has_circuit', 'value': value is not None})
+            else:
+                yield ndjson_line({'type': kind, 'value': value})
+        yield ndjson_line({'type': 'status', 'value': 'Code executed successfully'})
+    except Exception as e:
+        yield ndjson_line({'type': 'error', 'value': str(e)})
+
+def _simulation_response(request, simulation_result):
+    # The full statevector is only serialized on request; GET .../results/ serves it otherwise
+    data = {
+        'status': 'Simulation completed successfully',
+        'statevector_count': len(simulation_result.statevector['prob']),
+        'probability_count': len(simulation_result.probabilities)
+    }
+    if request.query_params.get('include') == 'results':
+        data['results'] = SimulationResultSerializer(simulation_result).data
+    return Response(data)
+
+def _etag(*parts):
+    return hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+def _circuit_page_etag(request, circuit_id):
+    """ETag for pages rendered from a circuit and its simulation"""
+    row = QuantumCircuit.objects.filter(id=circuit_id, user=request.user).values_list(
+        'updated_at', 'simulation__updated_at'
+    ).first()
+    if row is None:
+        return None
+    # The page header shows the user's name and difficulty level
+    user = request.user
+    return _etag(*row, user.pk, user.username, user.difficulty_level)
+
 @login_required
+@condition(etag_func=_circuit_page_etag)
 def circuit_detail(request, circuit_id):
     """Circuit detail view"""
     circuit = get_object_or_404(QuantumCircuit, id=circuit_id, user=request.user)
@@ -85,7 +164,12 @@ class QuantumCircuitViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return QuantumCircuit.objects.filter(user=self.request.user)
+        # Scoping to the user is the ownership check: get_object() 404s on other users' circuits.
+        # The serializer nests the user and, for reads, the gates
+        queryset = QuantumCircuit.objects.select_related('user').filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related('gates')
+        return queryset
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -95,34 +179,36 @@ class QuantumCircuitViewSet(viewsets.ModelViewSet):
         """Parse Qiskit code and extract gates - SILENT VERSION"""
         circuit = self.get_object()
         
-        # Check if user owns this circuit
-        if circuit.user != request.user:
-            return Response(
-                {'error': 'Permission denied'}, 
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         parser = CircuitParser()
         
         try:
             # Parse the Qiskit code (this will now be silent)
             qiskit_circuit = parser.parse_qiskit_code(circuit.qiskit_code)
             
-            # Update circuit information
-            circuit.num_qubits = qiskit_circuit.num_qubits
-            circuit.num_classical_bits = qiskit_circuit.num_clbits
-            
-            # Generate circuit diagram
-            circuit.circuit_diagram_svg = parser.generate_circuit_diagram(qiskit_circuit)
-            circuit.save()
-            
-            # Clear existing gates
-            circuit.gates.all().delete()
+            # Update circuit information and generate circuit diagram
+            circuit_fields = {
+                'num_qubits': qiskit_circuit.num_qubits,
+                'num_classical_bits': qiskit_circuit.num_clbits,
+                'circuit_diagram_svg': parser.generate_circuit_diagram(qiskit_circuit)
+            }
+            changed_fields = {
+                field: value for field, value in circuit_fields.items() if getattr(circuit, field) != value
+            }
+            for field, value in changed_fields.items():
+                setattr(circuit, field, value)
             
-            # Create new gates
             gates_data = parser.extract_gates_from_circuit(qiskit_circuit)
-            for gate_data in gates_data:
-                CircuitGate.objects.create(circuit=circuit, **gate_data)
+            
+            with transaction.atomic():
+                # Only rows that differ from the stored gates are written
+                gates_changed = CircuitGate.sync_from_parsed(circuit, gates_data)
+                # UPDATE just the changed columns; updated_at is set by hand since update()
+                # skips auto_now, and the explanation ETag relies on it
+                if changed_fields or gates_changed:
+                    circuit.updated_at = timezone.now()
+                    QuantumCircuit.objects.filter(pk=circuit.pk).update(
+                        updated_at=circuit.updated_at, **changed_fields
+                    )
             
             return Response({
                 'status': 'Circuit parsed successfully',
@@ -136,20 +222,23 @@ class QuantumCircuitViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'],
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer])
     def execute_code(self, request, pk=None):
         """Execute user Qiskit code and return results including plots"""
         circuit = self.get_object()
         
-        # Check if user owns this circuit
-        if circuit.user != request.user:
-            return Response(
-                {'error': 'Permission denied'}, 
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         simulator = CircuitSimulator()
         
+        # Accept: application/x-ndjson streams the output and each plot as it is ready
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            response = StreamingHttpResponse(
+                _ndjson_code_events(simulator.stream_user_code(circuit.qiskit_code)),
+                content_type=NDJSONRenderer.media_type
+            )
+            response['Cache-Control'] = 'no-cache'
+            return response
+        
         try:
             # Execute user code
             result = simulator.execute_user_code(circuit.qiskit_code)
@@ -175,12 +264,13 @@ class QuantumCircuitViewSet(viewsets.ModelViewSet):
         """Run simulation on the circuit"""
         circuit = self.get_object()
         
-        # Check if user owns this circuit
-        if circuit.user != request.user:
-            return Response(
-                {'error': 'Permission denied'}, 
-                status=status.HTTP_403_FORBIDDEN
-            )
+        # Identical code was already simulated; serve the stored result
+        code_hash = hashlib.sha256(circuit.qiskit_code.encode()).hexdigest()
+        simulation_result = SimulationResult.objects.filter(
+            circuit=circuit, code_hash=code_hash, shots=1024
+        ).first()
+        if simulation_result is not None:
+            return _simulation_response(request, simulation_result)
         
         simulator = CircuitSimulator()
         parser = CircuitParser()
@@ -196,18 +286,22 @@ class QuantumCircuitViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Update circuit information if needed
+            # Update circuit information if needed, without rewriting the code and diagram columns
             if circuit.num_qubits != qiskit_circuit.num_qubits:
                 circuit.num_qubits = qiskit_circuit.num_qubits
                 circuit.num_classical_bits = qiskit_circuit.num_clbits
-                circuit.save()
+                circuit.updated_at = timezone.now()
+                QuantumCircuit.objects.filter(pk=circuit.pk).update(
+                    num_qubits=circuit.num_qubits,
+                    num_classical_bits=circuit.num_classical_bits,
+                    updated_at=circuit.updated_at
+                )
             
             # Run simulations
-            statevector = simulator.simulate_statevector(qiskit_circuit)
-            probabilities, counts = simulator.simulate_measurements(qiskit_circuit, shots=1024)
+            statevector, probabilities, counts = simulator.simulate(qiskit_circuit, shots=1024)
             
             # Validate simulation results
-            if not statevector:
+            if not statevector['prob']:
                 return Response(
                     {'error': 'Statevector simulation returned no results. The circuit might be too complex or contain unsupported operations.'}, 
                     status=status.HTTP_400_BAD_REQUEST
@@ -226,17 +320,12 @@ class QuantumCircuitViewSet(viewsets.ModelViewSet):
                     'statevector': statevector,
                     'probabilities': probabilities,
                     'counts': counts,
-                    'shots': 1024
+                    'shots': 1024,
+                    'code_hash': code_hash
                 }
             )
             
-            serializer = SimulationResultSerializer(simulation_result)
-            return Response({
-                'status': 'Simulation completed successfully',
-                'statevector_count': len(statevector),
-                'probability_count': len(probabilities),
-                'results': serializer.data
-            })
+            return _simulation_response(request, simulation_result)
             
         except Exception as e:
             error_message = str(e)
@@ -253,34 +342,47 @@ class QuantumCircuitViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=True, methods=['get'])
+    def results(self, request, pk=None):
+        """Get the stored simulation results for the circuit"""
+        simulation_result = get_object_or_404(
+            SimulationResult, circuit_id=pk, circuit__user=request.user
+        )
+        etag = quote_etag(_etag(simulation_result.pk, simulation_result.updated_at))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        
+        serializer = SimulationResultSerializer(simulation_result)
+        return Response(serializer.data, headers={'ETag': etag})
+    
     @action(detail=True, methods=['get'])
     def get_explanations(self, request, pk=None):
         """Get AI explanations for all gates in the circuit"""
         circuit = self.get_object()
-        tutor = AITutor()
-        explanations = []
-        
-        for gate in circuit.gates.all():
-            explanation = tutor.generate_gate_explanation(
-                gate.gate_type,
-                request.user.difficulty_level,
-                [g.gate_type for g in circuit.gates.all() if g.step_order < gate.step_order]
-            )
-            explanations.append({
-                'gate': gate.gate_type,
-                'qubits': gate.qubits,
-                'step_order': gate.step_order,
-                'explanation': explanation
-            })
+        # When every explanation is already stored, answer (or 304) from those
+        # without going near the AI
+        explanations = explain_circuit_gates(circuit, request.user.difficulty_level, stored_only=True)
+        if explanations is None:
+            if _wants_async(request):
+                return _enqueue(request, explain_circuit_gates_task, circuit.id, request.user.id)
+            explanations = explain_circuit_gates(circuit, request.user.difficulty_level)
         
-        return Response(explanations)
+        # Keyed on the content, so fallback text or an Explanation edited in admin
+        # never pins a stale 304
+        etag = quote_etag(_etag(explanations))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        return Response(explanations, headers={'ETag': etag})
 
 class QASessionViewSet(viewsets.ModelViewSet):
     serializer_class = QASessionSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return QASession.objects.filter(user=self.request.user)
+        # circuit_title reads the related circuit
+        return QASession.objects.select_related('circuit').filter(user=self.request.user)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -297,34 +399,10 @@ class QASessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        tutor = AITutor()
-        circuit_context = None
-        
-        if circuit_id:
-            try:
-                circuit = QuantumCircuit.objects.get(id=circuit_id, user=request.user)
-                circuit_context = {
-                    'num_qubits': circuit.num_qubits,
-                    'gates': [gate.gate_type for gate in circuit.gates.all()],
-                    'purpose': circuit.title
-                }
-            except QuantumCircuit.DoesNotExist:
-                pass
-        
-        try:
-            answer = tutor.answer_question(question, circuit_context, request.user.difficulty_level)
-        except Exception as e:
-            answer = f"AI service error: {str(e)}"
-        
-        # Save Q&A session
-        qa_session = QASession.objects.create(
-            user=request.user,
-            circuit_id=circuit_id,
-            question=question,
-            answer=answer,
-            context_gates=circuit_context['gates'] if circuit_context else []
-        )
+        if _wants_async(request):
+            return _enqueue(request, answer_question_task, request.user.id, question, circuit_id)
         
+        answer, qa_session = handle_question(request.user, question, circuit_id)
         return Response({
             'question': question,
             'answer': answer,
@@ -341,25 +419,45 @@ class QuizQuestionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def generate_quiz(self, request, pk=None):
         """Generate a quiz question for the circuit"""
-        circuit = get_object_or_404(QuantumCircuit, id=pk, user=request.user)
-        tutor = AITutor()
-        
-        quiz_data = tutor.generate_quiz_question(circuit, request.user.difficulty_level)
-        
-        quiz_question = QuizQuestion.objects.create(
-            circuit=circuit,
-            question=quiz_data['question'],
-            options=quiz_data['options'],
-            correct_answer=quiz_data['correct_answer'],
-            explanation=quiz_data['explanation'],
-            difficulty_level=request.user.difficulty_level
-        )
+        circuit = get_object_or_404(quiz_circuit_queryset(), id=pk, user=request.user)
+        if _wants_async(request):
+            return _enqueue(request, generate_quiz_task, circuit.id, request.user.id)
         
+        quiz_question = create_quiz_question(circuit, request.user.difficulty_level)
         serializer = self.get_serializer(quiz_question)
         return Response(serializer.data)
 
+_TASK_STATUSES = {
+    'PENDING': 'queued',
+    'RECEIVED': 'queued',
+    'STARTED': 'running',
+    'RETRY': 'running',
+    'SUCCESS': 'completed',
+    'FAILURE': 'failed',
+    'REVOKED': 'failed',
+}
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def task_status(request, task_id):
+    """Status, and once finished the result, of a task queued with ?async=1"""
+    if not QueuedTask.objects.filter(task_id=task_id, user=request.user).exists():
+        return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    result = AsyncResult(task_id)
+    data = {'task_id': task_id, 'status': _TASK_STATUSES.get(result.state, 'running')}
+    if result.successful():
+        data['result'] = result.result
+    elif result.failed():
+        data['error'] = str(result.result)
+    # A finished task has been reported; its ownership row is no longer needed
+    if result.ready():
+        QueuedTask.objects.filter(task_id=task_id).delete()
+    return Response(data)
+
 # Additional function-based views for web interface
 @login_required
+@condition(etag_func=_circuit_page_etag)
 def simulation_view(request, circuit_id):
     """Simulation results view"""
     circuit = get_object_or_404(QuantumCircuit, id=circuit_id, user=request.user)
@@ -369,47 +467,46 @@ def simulation_view(request, circuit_id):
         'simulation': simulation
     })
 
+@login_required
+def gate_explanation_stream(request):
+    """Stream a gate explanation as plain text while the model generates it"""
+    gate_type = request.GET.get('gate_type')
+    if not gate_type:
+        return JsonResponse({'error': 'gate_type is required'}, status=400)
+    
+    difficulty_level = request.GET.get('difficulty_level', request.user.difficulty_level)
+    context = request.GET.get('context')
+    context_gates = context.split(',') if context else None
+    
+    tutor = get_tutor()
+    response = StreamingHttpResponse(
+        tutor.stream_gate_explanation(gate_type, difficulty_level, context_gates),
+        content_type='text/plain; charset=utf-8'
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
+
 @login_required
 def qa_view(request):
     """Q&A session view"""
-    qa_sessions = QASession.objects.filter(user=request.user).order_by('-created_at')[:10]
-    circuits = QuantumCircuit.objects.filter(user=request.user)
+    # The template shows each session's circuit title
+    qa_sessions = list(
+        QASession.objects.filter(user=request.user).select_related('circuit').order_by('-created_at')[:10]
+    )
+    # Only used to fill the circuit picker
+    circuits = QuantumCircuit.objects.filter(user=request.user).only('id', 'title')
     
     if request.method == 'POST':
         question = request.POST.get('question')
         circuit_id = request.POST.get('circuit_id')
         
         if question:
-            # Use the OpenRouter tutor directly
-            tutor = AITutor()
-            circuit_context = None
-            
-            if circuit_id:
-                try:
-                    circuit = QuantumCircuit.objects.get(id=circuit_id, user=request.user)
-                    circuit_context = {
-                        'num_qubits': circuit.num_qubits,
-                        'gates': [gate.gate_type for gate in circuit.gates.all()],
-                        'purpose': circuit.title
-                    }
-                except QuantumCircuit.DoesNotExist:
-                    pass
-            
-            # Get AI answer
-            answer = tutor.answer_question(question, circuit_context, request.user.difficulty_level)
-            
-            # Save Q&A session
-            qa_session = QASession.objects.create(
-                user=request.user,
-                circuit_id=circuit_id,
-                question=question,
-                answer=answer,
-                context_gates=circuit_context['gates'] if circuit_context else []
-            )
+            # Same path as the ask_question API
+            answer, qa_session = handle_question(request.user, question, circuit_id)
             
-            # Return the same page with the new Q&A session
+            # Return the same page with the new Q&A session on top of the ones already loaded
             return render(request, 'tutor/qa_session.html', {
-                'qa_sessions': QASession.objects.filter(user=request.user).order_by('-created_at')[:10],
+                'qa_sessions': [qa_session, *qa_sessions[:9]],
                 'circuits': circuits,
                 'new_question': question,
                 'new_answer': answer